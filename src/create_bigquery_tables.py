@@ -1,8 +1,8 @@
 """ Module to create a BigQuery table from Schema"""
 
 from google.cloud import bigquery
-from prefect_gcp.credentials import GcpCredentials
 
+from utils.clients import get_bigquery_client, get_gcp_credentials
 from utils.data_models import BigQueryField, BigQuerySchema
 
 
@@ -13,12 +13,11 @@ def create_bigquery_dataset(dataset_id: str):
     Args:
         dataset_id: The name of the dataset to be created.
     """
-    # Load Credentials and Config
-    gcp_credentials = GcpCredentials.load("gcp-credentials")
-    project_id = gcp_credentials.project
+    # Load (cached) Credentials and Config
+    project_id = get_gcp_credentials().project
 
-    # Init Client
-    client = bigquery.Client(project=gcp_credentials.project)
+    # Get (cached) Client
+    client = get_bigquery_client()
 
     # Construct a full Dataset object to send to the API
     dataset_ref = f"{project_id}.{dataset_id}"
@@ -40,12 +39,11 @@ def create_bigquery_table(
         table_name: The name of the table to be created.
         fields: The fields of the table to be created.
     """
-    # Load Credentials and Config
-    gcp_credentials = GcpCredentials.load("gcp-credentials")
-    project_id = gcp_credentials.project
+    # Load (cached) Credentials and Config
+    project_id = get_gcp_credentials().project
 
-    # Init Client
-    client = bigquery.Client(project=gcp_credentials.project)
+    # Get (cached) Client
+    client = get_bigquery_client()
 
     # Construct a full Table object to send to the API
     table_id = f"{project_id}.{dataset_id}.{table_name}"
@@ -63,14 +61,14 @@ if __name__ == "__main__":
     domain_summary_bigquery_schema = BigQuerySchema(
         dataset_id="raw",
         table_name="google_jobs",
-        fields=[
+        fields=(
             BigQueryField(name="id", type="STRING", mode="REQUIRED", default_value_expression="GENERATE_UUID()"),
             BigQueryField(name="search_metadata", type="JSON", mode="REQUIRED"),
             # BigQueryField(name="search_parameters", type="JSON", mode="REQUIRED"),
             # BigQueryField(name="job_results", type="JSON", mode="REQUIRED")
-        ],
+        ),
     )
-    fields = domain_summary_bigquery_schema.format_schema()
+    fields = domain_summary_bigquery_schema.formatted
 
     # Create Bigquery Dataset
     create_bigquery_dataset(
@@ -1,45 +1,100 @@
 """ Engineer or extract new features """
 
-import re
+from collections import defaultdict
 
-from gensim.utils import simple_preprocess
+from etl.process import tokenize_text
 
+# Extension values that describe the employment type of a job
+EMPLOYMENT_TYPES = frozenset({"Vollzeit", "Teilzeit", "Praktikum"})
 
-def extract_keywords(keywords: list[str], text: str) -> list[str]:
-    """Extract keywords based on static list from text
+
+def filter_keyword_tokens(tokens: list[str]) -> set[str]:
+    """Filter tokens down to the set of tokens keywords are matched against
+    (same tokens as gensim's `simple_preprocess` with deacc=True, min_len=2,
+    max_len=20)
+
+    Parameters
+    ----------
+    tokens : list[str]
+          Tokens to filter (see `etl.process.tokenize_text`)
+    """
+
+    keyword_tokens = {
+        t for t in tokens if 2 <= len(t) <= 20 and not t.startswith("_")
+    }
+
+    return keyword_tokens
+
+
+def build_keyword_index(
+    keyword_groups: dict[str, list[str]]
+) -> dict[str, list[tuple[int, str, str]]]:
+    """Build an index from lowercase keyword to its occurrences (position,
+    group, keyword) in the keyword groups
+
+    Parameters
+    ----------
+    keyword_groups : dict[str, list[str]]
+          Lists of keywords by group name
+    """
+
+    index = {}
+    position = 0
+    for group, keywords in keyword_groups.items():
+        for k in keywords:
+            index.setdefault(k.lower(), []).append((position, group, k))
+            position += 1
+
+    return index
+
+
+def extract_keyword_groups_from_tokens(
+    index: dict[str, list[tuple[int, str, str]]], tokens: set[str]
+) -> dict[str, list[str]]:
+    """Extract keywords of all groups from (a set of) tokens in a single pass
 
     Parameters
     ----------
-    keywords : list[str]
-          List of keywords to extract
-    text : str
-          Text to extract keywords from
+    index : dict[str, list[tuple[int, str, str]]]
+          Index of the keyword groups (see `build_keyword_index`)
+    tokens : set[str]
+          Tokens to extract keywords from (see `filter_keyword_tokens`)
     """
 
-    matches = []
-    tokens = simple_preprocess(text, deacc=True, min_len=2, max_len=20)
+    # One intersection of the tokens with the keywords of all groups, sorted
+    # by position so keywords keep the order of their group
+    occurrences = sorted(o for t in tokens & index.keys() for o in index[t])
 
-    for k in keywords:
-        if k.lower() in tokens:
-            matches.append(k)
+    matches = defaultdict(list)
+    for _, group, keyword in occurrences:
+        matches[group].append(keyword)
 
     return matches
 
 
-def identify_extension_type(value, pattern) -> str:
-    """Identify extension type based on value
+def extract_description_features(
+    index: dict[str, list[tuple[int, str, str]]], texts: list[str]
+) -> list[tuple[dict[str, list[str]], int]]:
+    """Extract keywords of all groups and the number of tokens from multiple
+    texts (e.g. a chunk of texts processed by one worker process), tokenizing
+    every text only once
 
     Parameters
     ----------
-    value : str
-          Value to identify extension type from
-    pattern : re.Pattern
-          Regex Pattern to identify extension type from
+    index : dict[str, list[tuple[int, str, str]]]
+          Index of the keyword groups (see `build_keyword_index`)
+    texts : list[str]
+          Texts to extract the features from
     """
 
-    if value in ["Vollzeit", "Teilzeit", "Praktikum"]:
-        return "employment_type"
-    elif isinstance(re.search(pattern, value), re.Match):
-        return "posted_n_periods_ago"
-    else:
-        return "other"
+    features = []
+    for text in texts:
+        tokens = tokenize_text(text)
+
+        matches = extract_keyword_groups_from_tokens(
+            index, filter_keyword_tokens(tokens)
+        )
+
+        features.append((matches, len(tokens)))
+
+    return features
@@ -1,13 +1,15 @@
 """Python module related to load data"""
 
-from prefect_gcp.credentials import GcpCredentials
-from google.cloud import storage
+import io
+
+from utils.clients import get_gcs_bucket, get_storage_client
+
 
 def load_file_into_memory(
         load_dir: str, file_name: str, extension: str, load_location: str = "local"
 ):
 
-    """Load a file to stream
+    """Load a file to stream (returned as a buffer positioned at its start)
 
     Parameters
     ----------
@@ -27,17 +29,40 @@ def load_file_into_memory(
 
     if load_location == "gcs":
 
-      # Load Credentials and Config
-      gcp_credentials = GcpCredentials.load("gcp-credentials")
-      project_id = gcp_credentials.project
+        # Get (cached) Bucket
+        gcs_bucket = get_gcs_bucket("serpapi_jobs")
+
+        # Stream download from GCS into a buffer
+        blob = gcs_bucket.blob(load_path)
+        buffer = io.BytesIO()
+        blob.download_to_file(buffer)
+        buffer.seek(0)
+
+        return buffer
+
 
-      # Init Client
-      client = storage.Client(project=project_id)
-      gcs_bucket = client.get_bucket("serpapi_jobs")    
+def list_search_ids(prefix: str) -> set[str]:
+    """List the Search IDs of all files in GCS starting with prefix
+
+    Files are named `<name>_<search_id>.<extension>`
+
+    Parameters
+    ----------
+    prefix : str
+        The prefix (e.g. directory) of the files
+    """
 
-      # Download from GCS
-      blob = gcs_bucket.blob(load_path)
-      bytes = blob.download_as_bytes()
+    # Get (cached) Client
+    client = get_storage_client()
 
-      return bytes
+    # Only the names are needed, so the listing responses only contain those
+    blobs = client.list_blobs(
+        "serpapi_jobs", prefix=prefix, fields="items(name),nextPageToken"
+    )
+    search_ids = {
+        b.name.split("_")[-1].split(".")[0]
+        for b in blobs
+        if not b.name.endswith("/")  # Skip directory placeholders
+    }
 
+    return search_ids
@@ -1,22 +1,43 @@
 """Python module related to persist data"""
 
-import json
-import time
+import io
+from concurrent.futures import ThreadPoolExecutor
 
-from prefect_gcp.credentials import GcpCredentials
-from google.cloud import storage
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
 from google.cloud import bigquery
 from typing import Union
 
+from utils.clients import get_bigquery_client, get_gcs_bucket
+
+# Maximum number of source URIs BigQuery accepts for a single load job
+MAX_SOURCE_URIS_PER_LOAD_JOB = 10000
+
+# Chunk size of resumable GCS uploads (must be a multiple of 256 KB). Files up
+# to 8 MB are uploaded with a single (multipart) request anyway
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Content Type and BigQuery Source Format of the supported file extensions
+CONTENT_TYPES = {
+    "json": "application/json",
+    "parquet": "application/vnd.apache.parquet",
+}
+SOURCE_FORMATS = {
+    "json": bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+    "parquet": bigquery.SourceFormat.PARQUET,
+}
+
+
 def save_result_as_file(
-    data: Union[dict, str], save_dir: str, file_name: str, extension: str, save_location: str = "local", indent: int = None
+    data: Union[dict, str, bytes, list[dict]], save_dir: str, file_name: str, extension: str, save_location: str = "local", indent: int = None
 ):
     """Save the data
 
     Parameters
     ----------
-    data : Union[dict, str]
-        The data to save
+    data : Union[dict, str, bytes, list[dict]]
+        The data to save (a list of records if the extension is 'parquet')
     save_dir : str
         The directory to save the file to
     file_name : str
@@ -26,7 +47,9 @@ def save_result_as_file(
     save_location : str, optional
         The location to store the file, by default "local"
     indent : int, optional
-        The indentation of the JSON file, by default None
+        The indentation of the JSON file, by default None. orjson only
+        supports an indentation of two spaces, so any truthy value results
+        in a two space indentation
     """
 
     allowed_save_locations = ["local", "gcs"]
@@ -39,59 +62,102 @@ def save_result_as_file(
     file_name_with_suffix_and_extension = f"{file_name}.{extension}"
     save_path = f"{save_dir}/{file_name_with_suffix_and_extension}"
 
+    # Serialize once, the same payload is used for every save location.
+    # Strings and Bytes (e.g. JSON New line delimited data) are already
+    # serialized
+    if extension == "parquet":
+        buffer = io.BytesIO()
+        pq.write_table(pa.Table.from_pylist(data), buffer, compression="zstd")
+        payload = buffer.getvalue()
+    elif isinstance(data, bytes):
+        payload = data
+    elif isinstance(data, str):
+        payload = data.encode("utf-8")
+    else:
+        # orjson only supports an indentation of two spaces
+        option = orjson.OPT_INDENT_2 if indent else 0
+        payload = orjson.dumps(data, option=option)
+
     if save_location == "local":
 
-        with open(save_path, "w") as f:
-            json.dump(obj=data, fp=f, indent=indent)
+        with open(save_path, "wb") as f:
+            f.write(payload)
 
     if save_location == "gcs":
 
-        # Load Credentials and Config
-        gcp_credentials = GcpCredentials.load("gcp-credentials")
-        project_id = gcp_credentials.project
+        # Get (cached) Bucket
+        gcs_bucket = get_gcs_bucket("serpapi_jobs")
+        blob = gcs_bucket.blob(save_path, chunk_size=UPLOAD_CHUNK_SIZE)
 
-        # Init Client
-        client = storage.Client(project=project_id)
-        gcs_bucket = client.get_bucket("serpapi_jobs")
-        blob = gcs_bucket.blob(save_path)
+        # Upload to GCS (streamed from the payload without copying it first)
+        blob.upload_from_file(
+            io.BytesIO(payload),
+            size=len(payload),
+            content_type=CONTENT_TYPES.get(extension, "application/json")
+            )
 
-        # Prepare data for upload if it is a dict
-        if isinstance(data, dict):
-            data = json.dumps(obj=data, indent=indent)
 
-        # Upload to GCS
-        blob.upload_from_string(
-            data=data, 
-            content_type="application/json"
-            )     
+def save_results_as_files(
+    results: list[tuple[Union[dict, str, bytes], str]], save_dir: str, extension: str, save_location: str = "local", indent: int = None, max_workers: int = 32
+):
+    """Save multiple results concurrently (uploads are I/O bound)
 
-def write_gcs_json_to_bigquery_table(load_dir: str, file_name: str, dataset_id: str, table_id: str, schema: list[bigquery.SchemaField] = None, autodetect: bool = True):
+    Parameters
+    ----------
+    results : list[tuple[Union[dict, str, bytes], str]]
+        The data to save together with the name of the file to save it to
+    save_dir : str
+        The directory to save the files to
+    extension : str
+        The extension of the files
+    save_location : str, optional
+        The location to store the files, by default "local"
+    indent : int, optional
+        The indentation of the JSON files, by default None
+    max_workers : int, optional
+        The maximum number of files saved at the same time, by default 32
+    """
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                save_result_as_file, data, save_dir, file_name, extension, save_location, indent
+            )
+            for data, file_name in results
+        ]
+
+    # Raise the first error (if any) once all files have been handled
+    for future in futures:
+        future.result()
+
+
+def write_gcs_json_to_bigquery_table(load_dir: str, file_names: list[str], dataset_id: str, table_id: str, schema: list[bigquery.SchemaField] = None, autodetect: bool = True, extension: str = "json"):
+
+    """Load JSON (or Parquet) files stored in GCS and write them to a BigQuery table
 
-    """Load a JSON file stored in GCS and write it to a BigQuery table
+    All files are loaded with as few load jobs as possible (BigQuery accepts
+    up to 10.000 source URIs per load job) instead of one load job per file.
 
     Parameters
     ----------
     load_dir : str
-        The directory to load the file from
-    file_name : str
-        The name of the file to load
-    extension : str
-        The extension of the file
-    load_location : str, optional
-        The location to load the file from, by default "local"
+        The directory to load the files from
+    file_names : list[str]
+        The names of the files to load (without extension)
     dataset_id : str
         The BigQuery dataset to write to
     table_id : str
         The BigQuery table to write to
     schema : list[bigquery.SchemaField]
         The schema of the BigQuery table
+    autodetect : bool, optional
+        Whether to let BigQuery detect the schema, by default True
+    extension : str, optional
+        The extension of the files ('json' or 'parquet'), by default 'json'
     """
 
-    # Load Credentials and Config
-    gcp_credentials = GcpCredentials.load("gcp-credentials")
-
-    # Init Client
-    client = bigquery.Client(project=gcp_credentials.project)
+    # Get (cached) Client
+    client = get_bigquery_client()
 
     # Construct Table reference
     table_ref = f"{dataset_id}.{table_id}"
@@ -99,16 +165,17 @@ def write_gcs_json_to_bigquery_table(load_dir: str, file_name: str, dataset_id:
     job_config = bigquery.LoadJobConfig(
         autodetect=autodetect,
         schema=schema,
-        source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+        source_format=SOURCE_FORMATS[extension],
         write_disposition="WRITE_APPEND"
     )
 
-    # Construct URI
-    uri = f"gs://serpapi_jobs/{load_dir}/{file_name}.json"
-    job = client.load_table_from_uri(uri, table_ref, job_config=job_config)
+    # Construct URIs
+    uris = [f"gs://serpapi_jobs/{load_dir}/{f}.{extension}" for f in file_names]
+
+    for i in range(0, len(uris), MAX_SOURCE_URIS_PER_LOAD_JOB):
+        job = client.load_table_from_uri(
+            uris[i:i + MAX_SOURCE_URIS_PER_LOAD_JOB], table_ref, job_config=job_config
+        )
 
-    # Wait for the job to complete.
-    while job.state != "DONE":
-        job.reload()
-        time.sleep(2)
-    print(job.result())
\ No newline at end of file
+        # Wait for the job to complete (blocks instead of polling the job state)
+        print(job.result())
@@ -1,30 +1,38 @@
 """Python module to process data"""
 
-from gensim.utils import tokenize
+import re
+
+from gensim.utils import deaccent
+
+# Pattern gensim uses to tokenize text (runs of word characters, no digits)
+ALPHABETIC_PATTERN = re.compile(r"(?:(?!\d)\w)+")
 
 
 def flatten_json(y):
     """ Flatten a dict (so it can be stored as JSONL file)"""
     out = {}
 
-    def flatten(x, name=""):
-        if type(x) is dict:
-            for a in x:
-                flatten(x[a], name + a + "_")
-        elif type(x) is list:
-            i = 0
-            for a in x:
-                flatten(a, name + str(i) + "_")
-                i += 1
+    # Walk the structure with an explicit stack instead of recursion. Key
+    # parts are collected in a tuple and only joined once a leaf is reached
+    stack = [((), y)]
+    while stack:
+        prefix, x = stack.pop()
+        if isinstance(x, dict):
+            # Push in reverse order, so the keys keep their original order
+            for k, v in reversed(x.items()):
+                stack.append((prefix + (k,), v))
+        elif isinstance(x, list):
+            for i, v in reversed(list(enumerate(x))):
+                stack.append((prefix + (f"{i}",), v))
         else:
-            out[name[:-1]] = x
+            out["_".join(prefix)] = x
 
-    flatten(y)
     return out
 
 
 def tokenize_text(text: str) -> list[str]:
-    """Tokenize text
+    """Tokenize text (lowercased and deaccented, same tokens as gensim's
+    `tokenize(text, deacc=True, lower=True)`)
 
     Parameters
     ----------
@@ -32,6 +40,12 @@ def tokenize_text(text: str) -> list[str]:
           Text to tokenize
     """
 
-    tokens = list(tokenize(text, deacc=True, lower=True))
+    text = text.lower()
+
+    # Only texts with non-ASCII characters can contain accents
+    if not text.isascii():
+        text = deaccent(text)
+
+    tokens = ALPHABETIC_PATTERN.findall(text)
 
     return tokens
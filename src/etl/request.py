@@ -1,9 +1,43 @@
 """Python module related to requesting data from APIs"""
 
+import threading
+
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+SERPAPI_URL = "https://serpapi.com/search"
+
+# Seconds to wait for the connection and for the response of a single request
+REQUEST_TIMEOUT = 30
 
+# Maximum number of requests sent to Serpapi at the same time (requests are
+# submitted concurrently, this keeps them within Serpapi's rate limits)
+MAX_CONCURRENT_REQUESTS = 4
+_REQUEST_SEMAPHORE = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
 
-def request_serpapi(params: dict) -> requests.Response:
+# Reuse connections (keep-alive) across requests instead of opening a new
+# TCP + TLS connection per request and retry rate limited requests and
+# transient server errors. Once the retries are exhausted the last response
+# is returned (instead of raising), so it is handled like any other error
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=32,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            raise_on_status=False,
+        ),
+    ),
+)
+
+
+def request_serpapi(params: dict, static_query: str = "") -> requests.Response:
     """
     Request the API
 
@@ -11,9 +45,17 @@ def request_serpapi(params: dict) -> requests.Response:
     ----------
     params : dict
         The parameters to pass to the API
+    static_query : str, optional
+        Already encoded Query String of the parameters shared by all
+        requests, by default "". The params are appended to it
     """
 
-    response = requests.get("https://serpapi.com/search", params=params)
+    url = f"{SERPAPI_URL}?{static_query}" if static_query else SERPAPI_URL
+
+    with _REQUEST_SEMAPHORE:
+        response = _SESSION.get(
+            url, params=params, timeout=REQUEST_TIMEOUT
+        )
 
     # response = GoogleSearch(params)
     
@@ -41,7 +83,8 @@ def parse_response(response: requests.Response) -> dict:
     response : requests.Response
     """
 
-    response_dict = response.json()
+    # orjson parses the raw bytes directly, no need to decode them first
+    response_dict = orjson.loads(response.content)
 
     return response_dict
 
@@ -1,10 +1,11 @@
 """Flow and Tasks to load data from GCS and store in different BigQuery Tables"""
 
-from google.cloud import bigquery, storage
+from google.cloud import bigquery
 from prefect import flow, get_run_logger, task
-from prefect_gcp.credentials import GcpCredentials
+from prefect.task_runners import ConcurrentTaskRunner
 
-from etl import persist
+from etl import load, persist
+from utils.clients import get_bigquery_client, get_gcp_credentials
 from utils.config import GCSToBigQueryConfig
 
 
@@ -15,45 +16,45 @@ def get_unprocessed_search_ids(
     """ Find unprocessed Search IDs (= files in GCS) which have not been written to Bigquery yet"""
     logger = get_run_logger()
 
-    # Load Credentials and Config
-    gcp_credentials = GcpCredentials.load("gcp-credentials")
-    project_id = gcp_credentials.project
-
-    # Init GCS Client
-    client = storage.Client(project=project_id)
-
-    # Get Search IDs of processed files (= split files in GCS)
-    processed_blobs = client.list_blobs("serpapi_jobs", prefix=load_dir)
-    processed_search_ids = [
-        b.name.split("_")[-1].split(".")[0]
-        for b in processed_blobs
-        if b.name != f"{load_dir}"
-    ]
-
-    # ---------------------
-
-    # Init Bigquery Client
-    client = bigquery.Client(project=gcp_credentials.project)
+    # Load (cached) Credentials and Config
+    project_id = get_gcp_credentials().project
+
+    # Get Search IDs of processed files of this table (= split files in GCS)
+    processed_search_ids = load.list_search_ids(f"{load_dir}/{table_id}_")
+
+    if processed_search_ids:
+
+        # Get (cached) Bigquery Client
+        client = get_bigquery_client()
+
+        # Construct Table reference
+        table_ref = f"{dataset_id}.{table_id}"
+
+        # Search ID is called "id" in the search_metadata table
+        id_column = "id" if table_id == "search_metadata" else "search_id"
+
+        # Let Bigquery find the Search IDs that have not been written yet, so
+        # only the unprocessed Search IDs are sent back
+        query = f"""
+        SELECT processed_id
+        FROM UNNEST(@search_ids) AS processed_id
+        LEFT JOIN `{project_id}.{table_ref}` t ON t.{id_column} = processed_id
+        WHERE t.{id_column} IS NULL
+        """
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ArrayQueryParameter(
+                    "search_ids", "STRING", sorted(processed_search_ids)
+                )
+            ]
+        )
 
-    # Construct Table reference
-    table_ref = f"{dataset_id}.{table_id}"
+        # Store results in List
+        result = client.query(query, job_config=job_config).result()
+        unprocessed_search_ids = [row[0] for row in result]
 
-    # Run Query
-    if table_id == "search_metadata":
-        query = f"SELECT distinct(id) FROM `{project_id}.{table_ref}`"  # Search ID is called "id" in the search_metadata table
     else:
-        query = f"SELECT distinct(search_id) FROM `{project_id}.{table_ref}`"
-
-    # Store results in List
-    result = client.query(query).result()
-    written_search_ids = [row[0] for row in result]
-
-    # ---------------------
-
-    # Find all Search IDs that have not been written to Bigquery yet
-    unprocessed_search_ids = list(
-        set(processed_search_ids).difference(set(written_search_ids))
-    )
+        unprocessed_search_ids = []
 
     logger.info("INFO level log message")
     logger.info(
@@ -64,83 +65,47 @@ def get_unprocessed_search_ids(
 
 
 @task
-def write_search_metadata_to_bigquery_table(
-    load_dir: str,
-    file_name: str,
-    dataset_id: str,
-    table_id: str,
-    schema: list,
-    autodetect: bool,
-):
-    """ Write Search Metadata to Bigquery Table """
-
-    logger = get_run_logger()
-
-    persist.write_gcs_json_to_bigquery_table(
-        load_dir, file_name, dataset_id, table_id, schema, autodetect
-    )
-
-    logger.info("INFO level log message")
-    logger.info(
-        f"Wrote data from file {file_name} to Bigquery table {dataset_id}.{table_id}"
-    )
-
-
-@task
-def write_search_parameters_to_bigquery_table(
+def write_to_bigquery_table(
     load_dir: str,
-    file_name: str,
+    file_names: list[str],
     dataset_id: str,
     table_id: str,
     schema: list,
     autodetect: bool,
 ):
-    """ Write Search Parameters to Bigquery Table """
+    """ Write Search Metadata, Search Parameters or Job Results to Bigquery Table """
 
     logger = get_run_logger()
 
     persist.write_gcs_json_to_bigquery_table(
-        load_dir, file_name, dataset_id, table_id, schema, autodetect
+        load_dir, file_names, dataset_id, table_id, schema, autodetect
     )
 
     logger.info("INFO level log message")
     logger.info(
-        f"Wrote data from file {file_name} to Bigquery table {dataset_id}.{table_id}"
+        f"Wrote data from {len(file_names)} files to Bigquery table {dataset_id}.{table_id}"
     )
 
 
-@task
-def write_job_results_to_bigquery_table(
-    load_dir: str,
-    file_name: str,
-    dataset_id: str,
-    table_id: str,
-    schema: list,
-    autodetect: bool,
-):
-    """ Write Job Results to Bigquery Table"""
-
-    logger = get_run_logger()
-
-    persist.write_gcs_json_to_bigquery_table(
-        load_dir, file_name, dataset_id, table_id, schema, autodetect
-    )
-
-    logger.info("INFO level log message")
-    logger.info(
-        f"Wrote data from file {file_name} to Bigquery table {dataset_id}.{table_id}"
-    )
-
-
-@flow
+@flow(task_runner=ConcurrentTaskRunner())
 def gcs_to_bigquery_flow(config: GCSToBigQueryConfig):
     """ Load files from GCS to Bigquery """
 
-    unprocessed_search_metadata_search_ids = get_unprocessed_search_ids(
-        load_dir=config.load_dir,
-        dataset_id=config.dataset_id,
-        table_id="search_metadata",
-    )
+    # Lookups and load jobs of the different tables are independent of each
+    # other, so they are submitted to run concurrently
+    unprocessed_search_ids_futures = {
+        table_id: get_unprocessed_search_ids.submit(
+            load_dir=config.load_dir,
+            dataset_id=config.dataset_id,
+            table_id=table_id,
+        )
+        for table_id in ["search_metadata", "search_parameters", "job_results"]
+    }
+    futures = []
+
+    unprocessed_search_metadata_search_ids = unprocessed_search_ids_futures[
+        "search_metadata"
+    ].result()
 
     schema = [
         bigquery.SchemaField("total_time_taken", "FLOAT", "NULLABLE"),
@@ -153,24 +118,25 @@ def gcs_to_bigquery_flow(config: GCSToBigQueryConfig):
         bigquery.SchemaField("id", "STRING", "NULLABLE"),
     ]
 
-    for i in unprocessed_search_metadata_search_ids:
-        file_name = f"search_metadata_{i}"
-        write_search_metadata_to_bigquery_table(
+    # Load all unprocessed files with a single load job
+    if unprocessed_search_metadata_search_ids:
+        future = write_to_bigquery_table.submit(
             load_dir=config.load_dir,
-            file_name=file_name,
+            file_names=[
+                f"search_metadata_{i}" for i in unprocessed_search_metadata_search_ids
+            ],
             dataset_id=config.dataset_id,
             table_id="search_metadata",
             schema=schema,
             autodetect=False,
         )
+        futures.append(future)
 
     # ----------------------------------------
 
-    unprocessed_search_parameters_search_ids = get_unprocessed_search_ids(
-        load_dir=config.load_dir,
-        dataset_id=config.dataset_id,
-        table_id="search_parameters",
-    )
+    unprocessed_search_parameters_search_ids = unprocessed_search_ids_futures[
+        "search_parameters"
+    ].result()
 
     schema = [
         bigquery.SchemaField("search_id", "STRING", "NULLABLE"),
@@ -184,24 +150,25 @@ def gcs_to_bigquery_flow(config: GCSToBigQueryConfig):
         bigquery.SchemaField("q", "STRING", "NULLABLE"),
     ]
 
-    for i in unprocessed_search_parameters_search_ids:
-        file_name = f"search_parameters_{i}"
-        write_search_parameters_to_bigquery_table(
+    # Load all unprocessed files with a single load job
+    if unprocessed_search_parameters_search_ids:
+        future = write_to_bigquery_table.submit(
             load_dir=config.load_dir,
-            file_name=file_name,
+            file_names=[
+                f"search_parameters_{i}" for i in unprocessed_search_parameters_search_ids
+            ],
             dataset_id=config.dataset_id,
             table_id="search_parameters",
             schema=schema,
             autodetect=False,
         )
+        futures.append(future)
 
     # ----------------------------------------
 
-    unprocessed_job_results_search_ids = get_unprocessed_search_ids(
-        load_dir=config.load_dir,
-        dataset_id=config.dataset_id,
-        table_id="job_results",
-    )
+    unprocessed_job_results_search_ids = unprocessed_search_ids_futures[
+        "job_results"
+    ].result()
 
     # schema=[
     #    bigquery.SchemaField("detected_extension", "JSON", "NULLABLE"),
@@ -218,16 +185,23 @@ def gcs_to_bigquery_flow(config: GCSToBigQueryConfig):
     #    bigquery.SchemaField("company_name", "STRING", "NULLABLE"),
     # ]
 
-    for i in unprocessed_job_results_search_ids:
-        file_name = f"job_results_{i}"
-        write_job_results_to_bigquery_table(
+    # Load all unprocessed files with a single load job
+    if unprocessed_job_results_search_ids:
+        future = write_to_bigquery_table.submit(
             load_dir=config.load_dir,
-            file_name=file_name,
+            file_names=[
+                f"job_results_{i}" for i in unprocessed_job_results_search_ids
+            ],
             dataset_id=config.dataset_id,
             table_id="job_results",
             schema=None,
             autodetect=True,
         )
+        futures.append(future)
+
+    # Wait for all load jobs to finish (and raise if one of them failed)
+    for future in futures:
+        future.result()
 
 
 if __name__ == "__main__":
@@ -1,99 +1,178 @@
 """ Flow and Tasks to engineer and extract features from raw Bigquery data and load them in final tables """
 
-import json
+import functools
+import math
+import multiprocessing
+import os
 import re
-import time
+import site
+from concurrent.futures import ProcessPoolExecutor
 
+import numpy as np
+import orjson
 import pandas as pd
+import pyarrow as pa
 from google.cloud import bigquery
 from prefect import flow, get_run_logger, task
+from prefect.task_runners import ConcurrentTaskRunner
 from prefect_gcp.credentials import GcpCredentials
 
-from etl import engineer, process
+from etl import engineer
+from utils.clients import (
+    get_bigquery_client,
+    get_bigquery_storage_client,
+    get_gcp_credentials,
+)
 from utils.config import KeywordExtractionConfig, RegexConfig
 
+# Spawning worker processes (which import the flow's dependencies again)
+# only pays off for many descriptions and multiple CPUs
+PROCESS_POOL_MIN_DESCRIPTIONS = 20000
+PROCESS_POOL_MAX_WORKERS = 4
 
-@task
-def load_job_results(gcp_credentials: GcpCredentials) -> pd.DataFrame:
-    """ Load Job Results Dataframe from Bigquery"""
-
-    logger = get_run_logger()
-
-    query = """
-    SELECT jr.*, sm.created_at, sm.google_jobs_url, sp.q
-    FROM `raw.job_results` jr
-    JOIN `raw.search_metadata` sm ON jr.search_id = sm.id
-    JOIN `raw.search_parameters` sp ON jr.search_id = sp.search_id
-    """
-    df = pd.read_gbq(
-        query, project_id=gcp_credentials.project, dialect="standard"
-    )
-
-    logger.info("INFO level log message")
-    logger.info(
-        f"Loaded Job Results Dataframe with Shape: '{df.shape}' from Bigquery"
-    )
-
-    return df
+# Directory of the flow (and of the `etl` and `utils` packages). Prefect
+# deployments don't keep it on sys.path, so the worker processes add it
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
 
 
 @task
-def extract_keywords_from_job_descriptions(
-    df: pd.DataFrame, config: KeywordExtractionConfig
-) -> pd.DataFrame:
-    """ Extract keywords from job descriptions """
+def load_job_results(project_id: str) -> pd.DataFrame:
+    """Load Job Results Dataframe from Bigquery
+
+    Parameters
+    ----------
+    project_id : str
+        The GCP project that contains the raw tables
+    """
 
     logger = get_run_logger()
 
-    config_dict = config.__dict__
+    # Text Length and Homeoffice flag are computed by Bigquery, the
+    # Keywords and Tokens depend on the (Python) tokenization. Job Results are
+    # deduplicated by htidocid (keeping the first Job Ad) in Bigquery as well
+    query = f"""
+    SELECT
+        jr.*,
+        sm.created_at,
+        sm.google_jobs_url,
+        sp.q,
+        LENGTH(jr.description) AS text_length_in_chars,
+        IF(LOWER(jr.description) LIKE '%homeoffice%', 'yes', 'no') AS homeoffice_yes_no
+    FROM `{project_id}.raw.job_results` jr
+    JOIN `{project_id}.raw.search_metadata` sm ON jr.search_id = sm.id
+    JOIN `{project_id}.raw.search_parameters` sp ON jr.search_id = sp.search_id
+    WHERE TRUE
+    QUALIFY ROW_NUMBER() OVER (
+        PARTITION BY JSON_VALUE(jr.job_id, '$.htidocid')
+        ORDER BY sm.created_at
+    ) = 1
+    """
 
-    df_keywords = pd.DataFrame()
-    for k, v in config_dict.items():
-        try:
-            df_temp = pd.DataFrame(
-                {
-                    "job_id": df["job_id"].tolist(),
-                    k: [
-                        engineer.extract_keywords(v, d)
-                        for d in df["description"].tolist()
-                    ],
-                }
-            )
-            df_keywords = pd.concat([df_keywords, df_temp], axis=1)
+    # Download the result via the BigQuery Storage API (Arrow over gRPC)
+    # instead of paging through it as JSON
+    client = get_bigquery_client()
+    table = (
+        client.query(query)
+        .result()
+        .to_arrow(bqstorage_client=get_bigquery_storage_client())
+    )
 
-        except Exception as e:
-            logger.error("ERROR level log message")
-            logger.error(f"Error while saving file: {e}")
+    # Convert to a Dataframe while releasing the Arrow buffers, so the data
+    # is not held twice in memory. Integers keep a nullable Integer dtype
+    # (like 'to_dataframe') instead of becoming floats
+    df = table.to_pandas(
+        split_blocks=True,
+        self_destruct=True,
+        types_mapper={pa.int64(): pd.Int64Dtype()}.get,
+    )
+    del table
 
-    df_keywords = df_keywords.loc[:, ~df_keywords.columns.duplicated()].copy()
+    # Columns with only a few distinct values are stored as Categories
+    # (one integer code per row instead of one Python String per row)
+    df = df.astype(
+        {c: "category" for c in ["via", "q", "homeoffice_yes_no"]}
+    )
 
     logger.info("INFO level log message")
     logger.info(
-        f"Created Keyword Dataframe with Shape: '{df_keywords.shape}' from Bigquery"
+        f"Loaded Job Results Dataframe with Shape: '{df.shape}' from Bigquery"
     )
 
-    return df_keywords
+    return df
 
 
 @task
-def extract_text_length_from_job_descriptions(
-    df: pd.DataFrame,
+def extract_features_from_job_descriptions(
+    df: pd.DataFrame, config: KeywordExtractionConfig
 ) -> pd.DataFrame:
-    """ Extract text length from job descriptions """
+    """ Extract keywords and number of tokens from job descriptions """
 
     logger = get_run_logger()
 
-    df["text_length_in_chars"] = df["description"].apply(lambda x: len(x))
-    df["number_tokens"] = df["description"].apply(
-        lambda x: len(process.tokenize_text(x))
-    )
+    keyword_groups = config.keyword_groups()
+
+    # Tokenize every distinct description once, match the keywords of all
+    # groups and count the tokens in a single pass per description. The same
+    # description is often posted for multiple jobs, the codes map the
+    # features back to the jobs
+    codes, descriptions = pd.factorize(df["description"])
+    descriptions = descriptions.tolist()
+    index = engineer.build_keyword_index(keyword_groups)
+
+    # Tokenizing and matching is CPU bound, so many descriptions are split
+    # into chunks which are processed by multiple processes. The processes
+    # are spawned (not forked), as the flow process runs multiple threads
+    number_workers = min(os.cpu_count() or 1, PROCESS_POOL_MAX_WORKERS)
+    if (
+        number_workers > 1
+        and len(descriptions) >= PROCESS_POOL_MIN_DESCRIPTIONS
+    ):
+        chunk_size = math.ceil(len(descriptions) / (number_workers * 4))
+        chunks = [
+            descriptions[i : i + chunk_size]
+            for i in range(0, len(descriptions), chunk_size)
+        ]
+        with ProcessPoolExecutor(
+            max_workers=number_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=site.addsitedir,
+            initargs=(SRC_DIR,),
+        ) as executor:
+            features = [
+                f
+                for chunk_features in executor.map(
+                    functools.partial(
+                        engineer.extract_description_features, index
+                    ),
+                    chunks,
+                )
+                for f in chunk_features
+            ]
+
+    else:
+        features = engineer.extract_description_features(index, descriptions)
+
+    # Missing descriptions have the code -1, which maps to the appended
+    # features (no keywords and no tokens)
+    features.append(({}, 0))
+
+    # Collect the columns first and create the Dataframe once
+    feature_columns = {"job_id": df["job_id"].tolist()}
+    for k in keyword_groups:
+        group_matches = [m.get(k, []) for m, _ in features]
+        feature_columns[k] = [group_matches[c] for c in codes]
+
+    number_tokens = np.array([n for _, n in features])
+    feature_columns["number_tokens"] = number_tokens[codes]
+
+    df_features = pd.DataFrame(feature_columns)
 
     logger.info("INFO level log message")
     logger.info(
-        f"Created Text Length Dataframe with Shape: '{df.shape}' from Bigquery"
+        f"Created Description Features Dataframe with Shape: '{df_features.shape}' from Bigquery"
     )
 
-    return df
+    return df_features
 
 
 @task
@@ -101,8 +180,10 @@ def extract_features_from_job_id(df: pd.DataFrame) -> pd.DataFrame:
 
     logger = get_run_logger()
 
-    df["htidocid"] = df["job_id"].apply(lambda x: json.loads(x)["htidocid"])
-    df["job_title"] = df["job_id"].apply(lambda x: json.loads(x)["job_title"])
+    # Parse every Job ID only once
+    job_ids = [orjson.loads(x) for x in df["job_id"].tolist()]
+    df["htidocid"] = [j["htidocid"] for j in job_ids]
+    df["job_title"] = [j["job_title"] for j in job_ids]
 
     logger.info("INFO level log message")
     logger.info(f"There are {df['job_id'].nunique()} unique Job IDs")
@@ -113,37 +194,9 @@ def extract_features_from_job_id(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-@task
-def deduplicate_job_results(df: pd.DataFrame) -> pd.DataFrame:
-    """ Deduplicate Job Results """
-
-    logger = get_run_logger()
-
-    # Convert to Datetime
-    df["created_at"] = pd.to_datetime(df["created_at"])
-
-    # Deduplicate
-    df = df.sort_values(by=["created_at"])
-    df = df.drop_duplicates(
-        subset=["htidocid"], keep="first"
-    )  # Keep latest Job Ad
-
-    # Count duplicates
-    number_duplicates = df.duplicated(subset=["htidocid"], keep="first").sum()
-
-    logger.info("INFO level log message")
-    logger.info(
-        f"Deduplicated Job Results Dataframe with Shape: '{df.shape}' from Bigquery"
-    )
-    logger.info(f"Number of Duplicates: '{number_duplicates}'")
-    logger.info(f"Columns: '{df.columns}'")
-
-    return df
-
-
 @task
 def identify_extension_type_from_extensions(
-    df: pd.DataFrame, regex_pattern: re.Match
+    df: pd.DataFrame, regex_pattern: re.Pattern
 ) -> pd.DataFrame:
     """ Identify extension type from extension (in Job description) """
 
@@ -152,22 +205,34 @@ def identify_extension_type_from_extensions(
     # One Row per Extension (instead of List of Extensions)
     df = df.explode("extensions")
 
-    # Identify Extension Type
-    df["extension_type"] = df["extensions"].apply(
-        lambda x: engineer.identify_extension_type(x, regex_pattern)
+    # Identify Extension Type (employment type, posted n periods ago or other).
+    # Most extensions repeat across jobs, so every distinct extension is only
+    # classified once and mapped back to the rows by its code
+    codes, extensions = pd.factorize(df["extensions"])
+    extension_types = np.select(
+        [
+            extensions.isin(engineer.EMPLOYMENT_TYPES),
+            np.array(
+                [regex_pattern.search(e) is not None for e in extensions],
+                dtype=bool,
+            ),
+        ],
+        ["employment_type", "posted_n_periods_ago"],
+        default="other",
     )
 
+    # Missing extensions have the code -1, which maps to the appended "other"
+    df["extension_type"] = np.append(extension_types, "other")[codes]
+
     # Filter out other extension types (as they produce duplicates)
     df = df[df["extension_type"] != "other"]
 
-    # Create new Dataframe with one column for each extension type
-    df = (
-        df[["job_id", "extensions", "extension_type"]]
-        .set_index(["job_id", "extension_type"])
-        .unstack()
-        .reset_index()
-    )
-    df.columns = [col[1] if col[1] != "" else col[0] for col in df.columns]
+    # Create new Dataframe with one column for each extension type (pivot
+    # creates these columns directly, without a MultiIndex to flatten)
+    df = df.pivot(
+        index="job_id", columns="extension_type", values="extensions"
+    ).reset_index()
+    df.columns.name = None
 
     logger.info("INFO level log message")
     logger.info(
@@ -180,7 +245,7 @@ def identify_extension_type_from_extensions(
 
 @task
 def calculate_posting_date(
-    df: pd.DataFrame, pattern: re.Match
+    df: pd.DataFrame, pattern: re.Pattern
 ) -> pd.DataFrame:
     """ Calculate the day the Job was posted """
 
@@ -200,11 +265,10 @@ def calculate_posting_date(
     )
 
     # Normalize by converting Time Period to Hours
-    df["posted_n_periods_ago_in_hours"] = df.apply(
-        lambda row: row["posted_n_periods_ago_number"] * 24
-        if row["posted_n_periods_ago_unit"] == "Tage"
-        else row["posted_n_periods_ago_number"] * 1,
-        axis=1,
+    df["posted_n_periods_ago_in_hours"] = np.where(
+        df["posted_n_periods_ago_unit"] == "Tage",
+        df["posted_n_periods_ago_number"] * 24,
+        df["posted_n_periods_ago_number"],
     )
 
     # Convert to Datetime
@@ -225,36 +289,20 @@ def calculate_posting_date(
 
 
 @task
-def construct_other_features(df: pd.DataFrame) -> pd.DataFrame:
-    """ Creat other miscellaneous features """
-
-    logger = get_run_logger()
-
-    df["homeoffice_yes_no"] = df["description"].apply(
-        lambda x: "yes" if "homeoffice" in x.lower() else "no"
-    )
-
-    logger.info("INFO level log message")
-    logger.info(
-        f"Created Other Features Dataframe with Shape: '{df.shape}' from Bigquery"
-    )
-    logger.info(f"Columns: '{df.columns}'")
-
-    return df
-
-
-@task
-def create_final_bigquery_table(
+def write_final_bigquery_table(
+    df: pd.DataFrame,
     client: bigquery.Client,
     gcp_credentials: GcpCredentials,
     keyword_columns: list[str],
-) -> bigquery.table.Table:
-    """Create Final Bigquery Table
+) -> None:
+    """Write Final Bigquery Table (replaced by a single batch load job)
 
     Parameters
     ----------
     df : pd.DataFrame
         Dataframe with all features
+    client : bigquery.Client
+        Bigquery Client
     gcp_credentials : GcpCredentials
         GCP Credentials
     keyword_columns : list[str]
@@ -313,53 +361,69 @@ def create_final_bigquery_table(
             bigquery.SchemaField(name=k, field_type="STRING", mode="REPEATED")
         )
 
+    # Rows with missing required values would be rejected by Bigquery
+    required_columns = [f.name for f in schema if f.mode == "REQUIRED"]
+    df_valid = df.dropna(subset=required_columns)
+    number_invalid_rows = len(df) - len(df_valid)
+
+    # Dtypes of the Dataframe need to match the (String) types of the schema
+    df_valid = df_valid.astype({c: "str" for c in required_columns})
+
     project_id = gcp_credentials.project
     table_ref = f"{project_id}.final.job_results"
 
-    table = bigquery.Table(table_ref=table_ref, schema=schema)
-    client.delete_table(table, not_found_ok=True)
-    time.sleep(5)
-    client.create_table(table)
-
-    table_instance = client.get_table(table_ref)
+    # Load job creates or overwrites the table (incl. schema) atomically
+    job_config = bigquery.LoadJobConfig(
+        schema=schema,
+        source_format=bigquery.SourceFormat.PARQUET,
+        write_disposition="WRITE_TRUNCATE",
+        create_disposition="CREATE_IF_NEEDED",
+    )
+    job = client.load_table_from_dataframe(
+        df_valid, table_ref, job_config=job_config
+    )
+    job.result()
 
     logger.info("INFO level log message")
-    logger.info(f"Created Final Bigquery Table: '{table_ref}'")
-
-    return table_instance
+    logger.info(
+        f"Wrote {len(df_valid)} rows to Final Bigquery Table: '{table_ref}'"
+    )
+    logger.info(
+        f"Skipped {number_invalid_rows} rows with missing required values"
+    )
 
 
-@flow
+@flow(task_runner=ConcurrentTaskRunner())
 def final_bigquery_flow(
-    keyword_extract_config: KeywordExtractionConfig, regex_config: RegexConfig
+    keyword_extract_config: KeywordExtractionConfig,
+    regex_config: RegexConfig,
+    save_local_copy: bool = False,
 ):
     """ Create Final Bigquery Tables """
 
-    # Load Credentials and Config
-    gcp_credentials = GcpCredentials.load("gcp-credentials")
+    # Load (cached) Credentials and Config
+    gcp_credentials = get_gcp_credentials()
 
     # Load Job Results
-    df = load_job_results(gcp_credentials)
+    df = load_job_results(gcp_credentials.project)
 
-    # Extract Keywords from Job Descriptions
-    df_keywords = extract_keywords_from_job_descriptions(
-        df[["job_id", "description"]], keyword_extract_config
-    )
+    # Feature extractions are independent of each other, so they are submitted
+    # to run concurrently. The column selection is taken before submitting,
+    # as 'extract_features_from_job_id' adds columns to 'df' while it runs
 
-    # Extract Text Length from Job Descriptions
-    df_text_length = extract_text_length_from_job_descriptions(
-        df[["job_id", "description"]]
+    # Extract Keywords and Number of Tokens from Job Descriptions
+    description_features_future = extract_features_from_job_descriptions.submit(
+        df[["job_id", "description"]], keyword_extract_config
     )
 
     # Extract htidocid from Job ID
-    df_job_id_parsed = extract_features_from_job_id(df)
+    job_id_parsed_future = extract_features_from_job_id.submit(df)
 
-    # Deduplicate Job Results
-    df_deduplicated = deduplicate_job_results(df_job_id_parsed)
+    df_job_id_parsed = job_id_parsed_future.result()
 
     # Identify Extension Type from Extension
     df_extension_type = identify_extension_type_from_extensions(
-        df_deduplicated[["job_id", "extensions"]], regex_config.day_hour_regex
+        df_job_id_parsed[["job_id", "extensions"]], regex_config.day_hour_regex
     )
 
     # Calculate Posting Date
@@ -367,7 +431,7 @@ def final_bigquery_flow(
     ## Get Created at for each Job
     df_extension_type_with_created_at = pd.merge(
         df_extension_type,
-        df_deduplicated[["job_id", "created_at"]],
+        df_job_id_parsed[["job_id", "created_at"]],
         on="job_id",
         how="left",
     )
@@ -382,27 +446,25 @@ def final_bigquery_flow(
         df_extension_type_filtered, regex_config.day_hour_regex
     )
 
-    # Construct Other Features
-    df_homeoffice = construct_other_features(df[["job_id", "description"]])
+    # Wait for the remaining Feature extraction
+    df_description_features = description_features_future.result()
 
     # ---------------------------------------------------------------------------------
 
-    # Combine Dataframes
-    dfs = [
-        df_keywords,
-        df_text_length,
-        df_extension_type,
-        df_posting_date,
-        df_homeoffice,
-    ]
-    df_job_results = df_deduplicated.copy()
-    for df in dfs:
-        df_job_results = df_job_results.merge(df, on="job_id", how="inner")
+    # Keyword columns contain lists (and are written as REPEATED fields)
+    keyword_columns = list(keyword_extract_config.keyword_groups())
 
-    # Remove Duplicate Columns
-    df_job_results = df_job_results.loc[
-        :, ~df_job_results.columns.duplicated()
-    ].copy()
+    # Combine Dataframes in a single step by aligning them on the Job ID
+    # (which is unique, as the Job Results are deduplicated when loaded)
+    feature_columns = [
+        (df_description_features, [*keyword_columns, "number_tokens"]),
+        (df_extension_type, ["employment_type"]),
+        (df_posting_date, ["posted_at"]),
+    ]
+    parts = [df_job_id_parsed.set_index("job_id")]
+    for df_features, columns in feature_columns:
+        parts.append(df_features.set_index("job_id")[columns])
+    df_job_results = pd.concat(parts, axis=1, join="inner").reset_index()
 
     # Keep only relevant columns
     df_out = df_job_results[
@@ -410,37 +472,22 @@ def final_bigquery_flow(
             "search_id",
             "via",
             "location",
-            "description_x",
+            "description",
             "company_name",
             "title",
-            "created_at_x",
+            "created_at",
             "q",
             "htidocid",
             "job_title",
-            "programming_markup_languages",
-            "databases",
-            "hosting_platforms",
-            "data_orchestration_frameworks",
-            "neural_net_frameworks",
-            "nlp_frameworks",
-            "data_processing_frameworks",
-            "business_intelligence_tools",
-            "devops_tools",
-            "version_control_tools",
-            "datawarehousing",
-            "command_line_tools",
+            *keyword_columns,
             "text_length_in_chars",
             "number_tokens",
-            "employment_type_x",
+            "employment_type",
             "posted_at",
             "homeoffice_yes_no",
         ]
     ]
 
-    # Remove "_x" from column names
-    cleaned_column_names = [col.replace("_x", "") for col in df_out.columns]
-    df_out.columns = cleaned_column_names
-
     # Convert to String
     df_out["created_at"] = df_out["created_at"].astype("str")
     df_out["posted_at"] = df_out["posted_at"].astype("str")
@@ -448,29 +495,21 @@ def final_bigquery_flow(
     # # Deduplicate
     # df_out = df_out.drop_duplicates()
 
-    # Convert String representation of list to actual list
-    config_dict = keyword_extract_config.__dict__
-    keyword_columns = list(config_dict.keys())
-    for col in keyword_columns:
-        df_out[col] = df_out[col].apply(
-            lambda x: eval(x) if isinstance(x, str) else x
+    # Save as Parquet file (only for debugging, the Bigquery Table is the
+    # actual output). Unlike CSV, Parquet keeps the lists of the keyword columns
+    if save_local_copy:
+        df_out.to_parquet(
+            "data/final/job_results.parquet", index=False, compression="zstd"
         )
 
-    # Save to CSV
-    df_out.to_csv("data/final/job_results.csv", index=False, sep=";")
+    # Get (cached) Bigquery Client
+    client = get_bigquery_client()
 
-    # Init Bigquery Client
-    client = bigquery.Client()
-
-    # Create Bigquery Table
-    table_instance = create_final_bigquery_table(
-        client, gcp_credentials, keyword_columns
+    # Write Bigquery Table
+    write_final_bigquery_table(
+        df_out, client, gcp_credentials, keyword_columns
     )
 
-    errors = client.insert_rows_from_dataframe(table_instance, df_out)
-    for chunk in errors:
-        print(f"encountered {len(chunk)} errors: {chunk}")
-
 
 if __name__ == "__main__":
     final_bigquery_flow(KeywordExtractionConfig(), RegexConfig())
@@ -1,10 +1,17 @@
 """Flow and Tasks to request Google Jobs API Endpoint from Serpapi"""
 
+from urllib.parse import urlencode
+
 import requests
 from prefect import flow, get_run_logger, task
+from prefect.task_runners import ConcurrentTaskRunner
 
 from etl import persist, request
-from utils.config import GoogleJobsAPIRequestConfig, GoogleJobsAPIQueryCombinations, create_permutations
+from utils.config import (
+    GoogleJobsAPIRequestConfig,
+    get_serpapi_api_key,
+    iter_query_groups,
+)
 
 
 @task(
@@ -14,19 +21,18 @@ from utils.config import GoogleJobsAPIRequestConfig, GoogleJobsAPIQueryCombinati
     description="Request Google Jobs API Endpoint from Serpapi (https://serpapi.com/google-jobs-api)",
 )
 def request_google_jobs_endpoint(
-    params: dict
+    params: dict, static_query: str
 ) -> requests.Response:
     """Request Google Jobs API Endpoint from Serpapi (https://serpapi.com/google-jobs-api)"""
 
     logger = get_run_logger()
 
-    response = request.request_serpapi(params)
-
-    logger.info("INFO level log messages")
-    logger.info(f"Requested API endpoint:")
-    logger.info(f"Using the following parameters: {params}")
+    response = request.request_serpapi(params, static_query)
 
-    logger.info(f"Response: {response}")
+    # Arguments are only formatted if the message is actually logged. The
+    # static Query String (containing the API Key) is not logged
+    logger.info("Requested API endpoint using the following parameters: %s", params)
+    logger.info("Response: %s", response)
 
     return response
 
@@ -41,9 +47,7 @@ def parse_google_jobs_endpoint_response(
 
     response_dict = request.parse_response(response)
 
-    logger.info("INFO level log messages")
-    logger.info("Parsed the following API Response:")
-    # logger.info(response_dict)
+    logger.info("Parsed API Response")
 
     return response_dict
 
@@ -67,37 +71,48 @@ def save_google_jobs_endpoint_result(
 
     persist.save_result_as_file(response_dict, save_dir, file_name_with_suffix, extension, save_location)
 
-    logger.info("INFO level log message")
-    logger.info(f"Saved API response here: {save_dir}/{file_name_with_suffix} | ({save_location})")
+    logger.info(
+        "Saved API response here: %s/%s | (%s)", save_dir, file_name_with_suffix, save_location
+    )
 
 
-@flow
+@flow(task_runner=ConcurrentTaskRunner())
 def google_jobs_endpoint_request_flow(
     request_config: GoogleJobsAPIRequestConfig,
-    combinations_config: GoogleJobsAPIQueryCombinations,
 ):
     """Flow to request the Domain Summary Serpstat API endpoint and store the results"""
 
-    # Create all possible combinations of the parameters
-    permutations = create_permutations(combinations_config.jobs, combinations_config.locations, combinations_config.start_offsets)
+    # Request the API Endpoint for each combination of job and location and
+    # each start offset. Requests are independent of each other (and I/O
+    # bound), so they are submitted to run concurrently, each with its own
+    # copy of the parameters. Parameters shared by all requests are only
+    # encoded once.
+    # The API Key is loaded for every flow run, so long running workers pick up
+    # a rotated API Key
+    static_query = (
+        f"{request_config.static_query}&"
+        f"{urlencode({'api_key': get_serpapi_api_key()})}"
+    )
+
+    futures = []
+    for (q, location), start_offsets in iter_query_groups():
+        for start in start_offsets:
+            params = {"q": q, "location": location, "start": start}
 
-    # Request the API Endpoint for each combination of parameters
-    for i in permutations:
-        (q, location, start) = i
-        request_config.params.update({"q": q})
-        request_config.params.update({"location": location})
-        request_config.params.update({"start": start})
+            response = request_google_jobs_endpoint.submit(params, static_query)
 
-        response = request_google_jobs_endpoint(request_config.params)
+            result = parse_google_jobs_endpoint_response.submit(response)
 
-        result = parse_google_jobs_endpoint_response(response)
+            future = save_google_jobs_endpoint_result.submit(
+                result, request_config.save_dir, request_config.file_name, request_config.extension, request_config.save_location
+            )
+            futures.append(future)
 
-        save_google_jobs_endpoint_result(
-            result, request_config.save_dir, request_config.file_name, request_config.extension, request_config.save_location
-        )
+    # Wait for all results to be saved (and raise if one of them failed)
+    for future in futures:
+        future.result()
 
 if __name__ == "__main__":
     google_jobs_endpoint_request_flow(
         request_config=GoogleJobsAPIRequestConfig(),
-        combinations_config=GoogleJobsAPIQueryCombinations()
     )
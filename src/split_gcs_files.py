@@ -1,47 +1,38 @@
 """Flow and Tasks to split raw GCS files into individual files"""
 
-import json
+import operator
+from concurrent.futures import ThreadPoolExecutor
 
-import pandas as pd
-from google.cloud import storage
+import orjson
 from prefect import flow, get_run_logger, task
-from prefect_gcp.credentials import GcpCredentials
+from prefect.task_runners import ConcurrentTaskRunner
 
 from etl import load, persist
 from utils.config import GCSFileSplittingConfig
 
+# Get the parts of a raw SerpAPI response which are stored in individual files
+get_response_parts = operator.itemgetter(
+    "search_metadata", "search_parameters", "jobs_results"
+)
+
 
 @task
 def get_unprocessed_search_ids(load_dir: str, save_dir: str) -> list:
 
     logger = get_run_logger()
 
-    # Load Credentials and Config
-    gcp_credentials = GcpCredentials.load("gcp-credentials")
-    project_id = gcp_credentials.project
-
-    # Init Client
-    client = storage.Client(project=project_id)
-
-    # Get Search IDs of raw files (which might or might not have been split yet)
-    raw_blobs = client.list_blobs("serpapi_jobs", prefix=load_dir)
-    raw_search_ids = [
-        b.name.split("_")[-1].split(".")[0]
-        for b in raw_blobs
-        if b.name != f"{load_dir}/"
-    ]
-
-    # Get Search IDs of processed files (which have already been split)
-    processed_blobs = client.list_blobs("serpapi_jobs", prefix=save_dir)
-    processed_search_ids = [
-        b.name.split("_")[-1].split(".")[0]
-        for b in processed_blobs
-        if b.name != f"{save_dir}"
-    ]
+    # List the Search IDs of raw files (which might or might not have been
+    # split yet) and of processed files (which have already been split) at
+    # the same time, as both listings are independent of each other
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        raw_search_ids = executor.submit(load.list_search_ids, f"{load_dir}/")
+        processed_search_ids = executor.submit(
+            load.list_search_ids, f"{save_dir}/"
+        )
 
     # Find all Search IDs that have not been processed yet (= files that have not been split yet)
     unprocessed_search_ids = list(
-        set(raw_search_ids).difference(set(processed_search_ids))
+        raw_search_ids.result() - processed_search_ids.result()
     )
 
     logger.info("INFO level log message")
@@ -77,17 +68,15 @@ def split_gcs_file_into_individual_files(
     logger = get_run_logger()
 
     # Load GCS file into memory
-    bytes = load.load_file_into_memory(
+    buffer = load.load_file_into_memory(
         load_dir, file_name, extension, load_location
     )
 
-    # Transform Bytes to dict
-    data = json.loads(bytes.decode("utf-8"))
+    # Transform Bytes to dict (orjson parses the buffer's memory directly)
+    data = orjson.loads(buffer.getbuffer())
 
     # Split data into different dicts
-    search_metadata = data["search_metadata"]
-    search_parameters = data["search_parameters"]
-    job_results = data["jobs_results"]
+    search_metadata, search_parameters, job_results = get_response_parts(data)
 
     # Combine different Dicts in a single Dict
     splitted_data = {
@@ -131,52 +120,43 @@ def save_splitted_files_in_gcs(
 
     search_id = splitted_data["search_metadata"]["id"]
 
+    results = []
     for k, v in splitted_data.items():
 
-        try:
-            # Store individual dicts as file in GCS
-            file_name_with_suffix = f"{k}_{search_id}"
-
-            if k == "search_parameters":
-                v.update({"search_id": search_id})
-
-            if k == "job_results":
-                for i in v:
-                    i.update({"search_id": search_id})
-                    i.pop("detected_extensions", None)
-
-                # Convert to JSON New line delimited format
-                data = pd.DataFrame(v).to_json(orient="records", lines=True)
-                persist.save_result_as_file(
-                    data,
-                    save_dir,
-                    file_name_with_suffix,
-                    extension,
-                    save_location,
-                    indent=None,
-                )
-
-            if k != "job_results":
-                persist.save_result_as_file(
-                    v,
-                    save_dir,
-                    file_name_with_suffix,
-                    extension,
-                    save_location,
-                    indent=None,
-                )
+        # Store individual dicts as file in GCS
+        file_name_with_suffix = f"{k}_{search_id}"
 
-        except Exception as e:
-            logger.error("ERROR level log message")
-            logger.error(f"Error while saving file: {e}")
+        if k == "search_parameters":
+            v.update({"search_id": search_id})
 
-        logger.info("INFO level log message")
-        logger.info(
-            f"Saved File here: {save_dir}/{file_name_with_suffix} | ({save_location})"
+        if k == "job_results":
+            for i in v:
+                i.update({"search_id": search_id})
+                i.pop("detected_extensions", None)
+
+            # Convert to JSON New line delimited format
+            v = b"\n".join(orjson.dumps(i) for i in v)
+
+        results.append((v, file_name_with_suffix))
+
+    try:
+        # Upload all files concurrently
+        persist.save_results_as_files(
+            results, save_dir, extension, save_location, indent=None
         )
 
+        logger.info("INFO level log message")
+        for _, file_name_with_suffix in results:
+            logger.info(
+                f"Saved File here: {save_dir}/{file_name_with_suffix} | ({save_location})"
+            )
+
+    except Exception as e:
+        logger.error("ERROR level log message")
+        logger.error(f"Error while saving file: {e}")
 
-@flow
+
+@flow(task_runner=ConcurrentTaskRunner())
 def split_gcs_files_flow(config: GCSFileSplittingConfig):
     """Flow to request the Domain Summary Serpstat API endpoint and store the results"""
 
@@ -186,15 +166,23 @@ def split_gcs_files_flow(config: GCSFileSplittingConfig):
         config.load_dir, config.save_dir
     )
 
+    # Files are independent of each other, so downloading, splitting and
+    # uploading of all files is submitted to run concurrently
+    futures = []
     for search_id in unprocessed_search_ids:
-        try:
-            file_name = f"google_jobs_{search_id}"
+        file_name = f"google_jobs_{search_id}"
 
-            splitted_data = split_gcs_file_into_individual_files(
-                config.load_dir, file_name
-            )
+        splitted_data = split_gcs_file_into_individual_files.submit(
+            config.load_dir, file_name
+        )
 
-            save_splitted_files_in_gcs(splitted_data, config.save_dir)
+        future = save_splitted_files_in_gcs.submit(splitted_data, config.save_dir)
+        futures.append(future)
+
+    # Wait for all files (a failing file doesn't stop the other files)
+    for future in futures:
+        try:
+            future.result()
 
         except Exception as e:
             logger.error("ERROR level log message")
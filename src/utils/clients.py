@@ -0,0 +1,66 @@
+""" Create cached Google Cloud Credentials and Clients """
+
+import functools
+
+from google.auth.credentials import Credentials
+from google.cloud import bigquery, bigquery_storage, storage
+from prefect_gcp.credentials import GcpCredentials
+
+
+@functools.lru_cache(maxsize=1)
+def get_gcp_credentials() -> GcpCredentials:
+    """Load the GCP Credentials Block from Prefect (once per process)"""
+
+    return GcpCredentials.load("gcp-credentials")
+
+
+@functools.lru_cache(maxsize=1)
+def get_google_credentials() -> Credentials:
+    """Create Google Auth Credentials from the GCP Credentials Block (once
+    per process), shared by all Clients"""
+
+    return get_gcp_credentials().get_credentials_from_service_account()
+
+
+@functools.lru_cache(maxsize=1)
+def get_bigquery_client() -> bigquery.Client:
+    """Create a BigQuery Client (once per process)"""
+
+    gcp_credentials = get_gcp_credentials()
+
+    return bigquery.Client(
+        project=gcp_credentials.project, credentials=get_google_credentials()
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def get_bigquery_storage_client() -> bigquery_storage.BigQueryReadClient:
+    """Create a BigQuery Storage Read Client (once per process)"""
+
+    return bigquery_storage.BigQueryReadClient(
+        credentials=get_google_credentials()
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def get_storage_client() -> storage.Client:
+    """Create a GCS Client (once per process)"""
+
+    gcp_credentials = get_gcp_credentials()
+
+    return storage.Client(
+        project=gcp_credentials.project, credentials=get_google_credentials()
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_gcs_bucket(bucket_name: str) -> storage.Bucket:
+    """Get a GCS Bucket (once per process and bucket)
+
+    Parameters
+    ----------
+    bucket_name : str
+        The name of the bucket
+    """
+
+    return get_storage_client().get_bucket(bucket_name)
@@ -1,12 +1,28 @@
 """ Create Pydantic Configuration models """
 
+import functools
 import itertools
 import re
+import threading
+from dataclasses import dataclass, field
+from typing import ClassVar, Final, Iterable, Iterator
+from urllib.parse import urlencode
 
+import cachetools
 from prefect.blocks.system import Secret
 from pydantic import BaseModel
 
 
+@cachetools.cached(
+    cachetools.TTLCache(maxsize=1, ttl=3600), lock=threading.Lock()
+)
+def get_serpapi_api_key() -> str:
+    """Load the Serpapi API Key from Prefect (at most once per hour, so a
+    rotated API Key is picked up by long running processes)"""
+
+    return Secret.load("serpapi-api-key").get()
+
+
 class GoogleJobsAPIRequestParams(BaseModel):
     """Parameters for requesting the Google Jobs API endpoint from Serpapi"""
 
@@ -18,13 +34,19 @@ class GoogleJobsAPIRequestParams(BaseModel):
     start: int = 0  # Offset, 10 = first ten search results are skipped
     google_domain: str = "google.de"
     location: str = "Cologne,North Rhine-Westphalia,Germany"
-    api_key: str = Secret.load("serpapi-api-key").get()
+    # The API Key is no default, it is loaded for every flow run (see
+    # `get_serpapi_api_key`)
 
 
-class GoogleJobsAPIRequestConfig(BaseModel):
+@dataclass(frozen=True)
+class GoogleJobsAPIRequestConfig:
     """Configuration for requesting the Google Jobs API endpoint from Serpapi"""
 
-    params: dict = dict(GoogleJobsAPIRequestParams())
+    # Doesn't contain the API Key, so the config (and the Query String encoded
+    # from it) can be kept and reused without pinning a rotated API Key
+    params: dict = field(
+        default_factory=lambda: GoogleJobsAPIRequestParams().dict()
+    )
     save_dir: str = "data/raw"
     file_name: str = "google_jobs"
     extension: str = "json"
@@ -32,68 +54,89 @@ class GoogleJobsAPIRequestConfig(BaseModel):
     dataset_id: str = "raw"  # BigQuery Dataset ID
     table_name: str = "google_jobs"  # BigQuery Table Name
 
+    # Parameters which differ between the requests of a flow run
+    query_param_names: ClassVar[frozenset[str]] = frozenset({"q", "location", "start"})
+
+    @functools.cached_property
+    def static_query(self) -> str:
+        """Parameters shared by all requests, encoded as Query String (encoded
+        once, as the Config is immutable)"""
+        return urlencode(
+            {k: v for k, v in self.params.items() if k not in self.query_param_names}
+        )
 
-class GCSFileSplittingConfig(BaseModel):
+
+@dataclass(frozen=True)
+class GCSFileSplittingConfig:
     """Configuration for splitting Raw GCS Files into seperate Files """
 
     load_dir: str = "data/raw/successful"
     save_dir: str = "data/processed"
 
 
-class GCSToBigQueryConfig(BaseModel):
+@dataclass(frozen=True)
+class GCSToBigQueryConfig:
     """Configuration for storing GCS Files into Bigquery"""
 
     load_dir: str = "data/processed"
     dataset_id: str = "raw"  # BigQuery Dataset ID
 
 
-class GoogleJobsAPIQueryCombinations(BaseModel):
-    """Search Queries for requesting the Google Jobs API endpoint from Serpapi"""
-
-    jobs: list[str] = ["Data Analyst", "Data Scientist", "Data Engineer"]
-    locations: list[str] = [
-        # Cities / regions nearby
-        "Cologne,North Rhine-Westphalia,Germany",
-        "Aachen,North Rhine-Westphalia,Germany",
-        "Bonn,North Rhine-Westphalia,Germany",
-        "Dusseldorf,North Rhine-Westphalia,Germany",
-        # Other Cities / regions in North Rhine-Westphalia
-        # "Essen,North Rhine-Westphalia,Germany",
-        # "Dortmund,North Rhine-Westphalia,Germany",
-        # "Duisburg,North Rhine-Westphalia,Germany",
-        # "Bielfeld,North Rhine-Westphalia,Germany",
-        # # Other big cities in Germany
-        # "Berlin,Germany",
-        # "Hamburg,Germany",
-        # "Munich,Bavaria,Germany",
-        # "Frankfurt,Hesse,Germany",
-        # "Stuttgart,Baden-Wurttemberg,Germany",
-        # "Leipzig,Saxony,Germany",
-        # "Bremen,Bremen,Germany",
-        # "Dresden,Saxony,Germany",
-        # "Hannover,Lower Saxony,Germany",
-        # "Nuremberg,Bavaria,Germany",
-        # "Bochum,North Rhine-Westphalia,Germany",
-        # "Wuppertal,North Rhine-Westphalia,Germany",
-        # "Munster,North Rhine-Westphalia,Germany"
-    ]
-    start_offsets: list[int] = [0, 10, 20]  # Top 30 Results
-
-
-def create_permutations(
-    jobs: list, locations: list, start_offsets: list
-) -> list[tuple]:
-    """Create all possible combinations of the given parameters"""
-
-    list_of_lists = [jobs, locations, start_offsets]
-    permutations = list(itertools.product(*list_of_lists))
-    return permutations
-
-
-class KeywordExtractionConfig(BaseModel):
+# Search Queries for requesting the Google Jobs API endpoint from Serpapi
+JOBS: Final[tuple[str, ...]] = (
+    "Data Analyst",
+    "Data Scientist",
+    "Data Engineer",
+)
+LOCATIONS: Final[tuple[str, ...]] = (
+    # Cities / regions nearby
+    "Cologne,North Rhine-Westphalia,Germany",
+    "Aachen,North Rhine-Westphalia,Germany",
+    "Bonn,North Rhine-Westphalia,Germany",
+    "Dusseldorf,North Rhine-Westphalia,Germany",
+    # Other Cities / regions in North Rhine-Westphalia
+    # "Essen,North Rhine-Westphalia,Germany",
+    # "Dortmund,North Rhine-Westphalia,Germany",
+    # "Duisburg,North Rhine-Westphalia,Germany",
+    # "Bielfeld,North Rhine-Westphalia,Germany",
+    # # Other big cities in Germany
+    # "Berlin,Germany",
+    # "Hamburg,Germany",
+    # "Munich,Bavaria,Germany",
+    # "Frankfurt,Hesse,Germany",
+    # "Stuttgart,Baden-Wurttemberg,Germany",
+    # "Leipzig,Saxony,Germany",
+    # "Bremen,Bremen,Germany",
+    # "Dresden,Saxony,Germany",
+    # "Hannover,Lower Saxony,Germany",
+    # "Nuremberg,Bavaria,Germany",
+    # "Bochum,North Rhine-Westphalia,Germany",
+    # "Wuppertal,North Rhine-Westphalia,Germany",
+    # "Munster,North Rhine-Westphalia,Germany"
+)
+START_OFFSETS: Final[tuple[int, ...]] = (0, 10, 20)  # Top 30 Results
+
+
+def iter_query_groups(
+    jobs: Iterable[str] = JOBS,
+    locations: Iterable[str] = LOCATIONS,
+    start_offsets: Iterable[int] = START_OFFSETS,
+) -> Iterator[tuple[tuple[str, str], Iterable[int]]]:
+    """Create all possible combinations of job and location (lazily, the
+    combinations are created while iterating), each with the start offsets
+    to request for that combination"""
+
+    for job, location in itertools.product(jobs, locations):
+        yield (job, location), start_offsets
+
+
+@dataclass(frozen=True)
+class KeywordExtractionConfig:
     """ Keywords to match against Job description """
 
-    programming_markup_languages: list[str] = [
+    # Keywords are shared (read-only) by all instances instead of being
+    # copied for every instance. Tuples keep the order of the keywords
+    programming_markup_languages: ClassVar[tuple[str, ...]] = (
         "SQL",
         "C++",
         "C#",
@@ -120,9 +163,13 @@ class KeywordExtractionConfig(BaseModel):
         "Kotlin",
         "Swift",
         "PHP",
-    ]
-    command_line_tools: list[str] = ["Bash", "Shell", "Powershell"]
-    databases: list[str] = [
+    )
+    command_line_tools: ClassVar[tuple[str, ...]] = (
+        "Bash",
+        "Shell",
+        "Powershell",
+    )
+    databases: ClassVar[tuple[str, ...]] = (
         "MySQL",
         "PostgreSQL",
         "MongoDB",
@@ -137,8 +184,8 @@ class KeywordExtractionConfig(BaseModel):
         "Couchbase",
         "Memcached",
         "MSSQL",
-    ]
-    hosting_platforms: list[str] = [
+    )
+    hosting_platforms: ClassVar[tuple[str, ...]] = (
         "AWS",
         "Azure",
         "GCP",
@@ -148,13 +195,13 @@ class KeywordExtractionConfig(BaseModel):
         "Firebase",
         "Cloudflare",
         "VMWare",
-    ]
-    data_orchestration_frameworks: list[str] = [
+    )
+    data_orchestration_frameworks: ClassVar[tuple[str, ...]] = (
         "Airflow",
         "Prefect",
         "Dagster",
-    ]
-    neural_net_frameworks: list[str] = [
+    )
+    neural_net_frameworks: ClassVar[tuple[str, ...]] = (
         "Keras",
         "Tensorflow",
         "Pytorch",
@@ -162,43 +209,62 @@ class KeywordExtractionConfig(BaseModel):
         "CNTK",
         "Theano",
         "Caffe",
-    ]
-    nlp_frameworks: list[str] = [
+    )
+    nlp_frameworks: ClassVar[tuple[str, ...]] = (
         "Huggingface",
         "Spacy",
         "NLTK",
         "Gensim",
         "StanfordNLP",
         "AllenNLP",
-    ]
-    data_processing_frameworks: list[str] = ["Spark", "Hadoop", "Dask", "Hive"]
-    business_intelligence_tools: list[str] = [
+    )
+    data_processing_frameworks: ClassVar[tuple[str, ...]] = (
+        "Spark",
+        "Hadoop",
+        "Dask",
+        "Hive",
+    )
+    business_intelligence_tools: ClassVar[tuple[str, ...]] = (
         "Tableau",
         "PowerBI",
         "Microstrategy",
         "Qlik",
         "Metabase",
         "Domo",
-    ]  # Add more
-    devops_tools: list[str] = ["Docker", "Kubernetes", "Terraform"]
-    version_control_tools: list[str] = [
+    )  # Add more
+    devops_tools: ClassVar[tuple[str, ...]] = (
+        "Docker",
+        "Kubernetes",
+        "Terraform",
+    )
+    version_control_tools: ClassVar[tuple[str, ...]] = (
         "Git",
         "Mercurial",
         "Subversion",
         "Perforce",
         "CVS",
-    ]
-    datawarehousing: list[str] = [
+    )
+    datawarehousing: ClassVar[tuple[str, ...]] = (
         "Snowflake",
         "Redshift",
         "BigQuery",
         "Databricks",
-    ]
+    )
+
+    @classmethod
+    def keyword_groups(cls) -> dict[str, tuple[str, ...]]:
+        """Keywords by group name (in the order the groups are defined)"""
+
+        return {name: getattr(cls, name) for name in cls.__annotations__}
+
+
+# Pattern to identify extension in job description (e.g. "vor 3 Tagen")
+DAY_HOUR_PATTERN = re.compile(r"vor\s+(\d+)\s+(Stunden|Tagen)")
 
 
 class RegexConfig(BaseModel):
     """ Collection of Regex Patterns """
 
-    day_hour_regex: re.Pattern = re.compile(
-        r"vor\s+(\d+)\s+(Stunden|Tagen)"
-    )  # to identify extension in job description
+    # Patterns are compiled once (when the module is imported) and shared by
+    # all instances
+    day_hour_regex: ClassVar[re.Pattern] = DAY_HOUR_PATTERN
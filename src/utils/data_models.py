@@ -1,32 +1,62 @@
 """ Create Data models """
 
+import functools
+import itertools
 from dataclasses import dataclass
-from typing import Optional
+from typing import NamedTuple, Optional
 
 from google.cloud import bigquery
 
+# Field Types and Modes accepted by BigQuery (Legacy and Standard SQL names
+# and aliases, in upper case as BigQuery treats them case-insensitively)
+BIGQUERY_FIELD_TYPES = frozenset({
+    "STRING", "BYTES", "INTEGER", "INT64", "FLOAT", "FLOAT64", "NUMERIC",
+    "DECIMAL", "BIGNUMERIC", "BIGDECIMAL", "BOOLEAN", "BOOL", "TIMESTAMP",
+    "DATE", "TIME", "DATETIME", "INTERVAL", "GEOGRAPHY", "JSON", "RECORD",
+    "STRUCT",
+})
+BIGQUERY_FIELD_MODES = frozenset({"NULLABLE", "REQUIRED", "REPEATED"})
 
-@dataclass
-class BigQueryField:
-    """BigQuery Field"""
+
+class BigQueryField(NamedTuple):
+    """BigQuery Field (a tuple, so no per-instance __dict__ is needed)"""
 
     name: str
     type: str
     mode: str
     default_value_expression: Optional[str] = None
 
-@dataclass
+
+@dataclass(frozen=True)
 class BigQuerySchema:
     """BigQuery Schema"""
 
     dataset_id: str
     table_name: str
-    fields: Optional[list[BigQueryField]] = None
-
-    def format_schema(self):
-        """Format BigQuery Schema using bigquery.SchemaField"""
-        formatted_schema = [
-            bigquery.SchemaField(field.name, field.type, field.mode, field.default_value_expression)
-            for field in self.fields
-        ]
+    fields: tuple[BigQueryField, ...] = ()
+
+    def __post_init__(self):
+        """Validate the Fields when the Schema is created (instead of when
+        BigQuery rejects the table)"""
+        for field in self.fields:
+            if field.type.upper() not in BIGQUERY_FIELD_TYPES:
+                raise ValueError(
+                    f"type of field '{field.name}' must be one of the following values: {sorted(BIGQUERY_FIELD_TYPES)}. \n Instead got: '{field.type}'"
+                )
+            if field.mode.upper() not in BIGQUERY_FIELD_MODES:
+                raise ValueError(
+                    f"mode of field '{field.name}' must be one of the following values: {sorted(BIGQUERY_FIELD_MODES)}. \n Instead got: '{field.mode}'"
+                )
+
+    @functools.cached_property
+    def formatted(self) -> list[bigquery.SchemaField]:
+        """BigQuery Schema formatted using bigquery.SchemaField (formatted once,
+        as the Schema is immutable)"""
+        # Fields are tuples in the positional argument order of
+        # bigquery.SchemaField, so they can be unpacked directly
+        formatted_schema = list(itertools.starmap(bigquery.SchemaField, self.fields))
         return formatted_schema
+
+    def format_schema(self) -> list[bigquery.SchemaField]:
+        """Format BigQuery Schema using bigquery.SchemaField (see `formatted`)"""
+        return self.formatted
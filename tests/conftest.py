@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Flows import their modules relative to src (e.g. `from etl import load`)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
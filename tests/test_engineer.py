@@ -0,0 +1,25 @@
+"""Test the feature engineering functions"""
+
+import pytest
+from gensim.utils import simple_preprocess
+
+from etl.engineer import filter_keyword_tokens
+from etl.process import tokenize_text
+
+TEXTS = [
+    "Wir suchen einen Data Engineer (m/w/d) für unser Team in Köln",
+    "Erfahrung mit Python 3.10, SQL & GCP; 5+ Jahre Berufserfahrung",
+    "Straße, Größe, Übermäßig, naïve café, Ärger über Öl",
+    "C++ / C# / R / Go: x a b 2nd 3D k8s",
+    "Datenverarbeitungsinfrastrukturentwicklung und Softwareentwicklungsmethoden",
+    "Programmiersprachen Qualitätssicherung Verantwortungsbereich",
+    "snake_case __dunder__ _x über_alles CamelCase",
+    "",
+]
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_filter_keyword_tokens_matches_gensim(text):
+    assert filter_keyword_tokens(tokenize_text(text)) == set(
+        simple_preprocess(text, deacc=True, min_len=2, max_len=20)
+    )
@@ -0,0 +1,54 @@
+"""Test that Prefect accepts the config objects the flows are called with"""
+
+from gcs_to_bigquery import gcs_to_bigquery_flow
+from load_final_bigquery_tables import final_bigquery_flow
+from request_google_jobs import google_jobs_endpoint_request_flow
+from split_gcs_files import split_gcs_files_flow
+from utils.config import (
+    GCSFileSplittingConfig,
+    GCSToBigQueryConfig,
+    GoogleJobsAPIRequestConfig,
+    KeywordExtractionConfig,
+    RegexConfig,
+)
+
+
+def test_google_jobs_endpoint_request_flow_parameters():
+    # The API Key is not part of the config, so no Secret is loaded here
+    config = GoogleJobsAPIRequestConfig()
+
+    parameters = google_jobs_endpoint_request_flow.validate_parameters(
+        {"request_config": config}
+    )
+
+    assert parameters["request_config"].params == config.params
+
+
+def test_split_gcs_files_flow_parameters():
+    config = GCSFileSplittingConfig()
+
+    parameters = split_gcs_files_flow.validate_parameters({"config": config})
+
+    assert parameters["config"].load_dir == config.load_dir
+
+
+def test_gcs_to_bigquery_flow_parameters():
+    config = GCSToBigQueryConfig()
+
+    parameters = gcs_to_bigquery_flow.validate_parameters({"config": config})
+
+    assert parameters["config"].dataset_id == config.dataset_id
+
+
+def test_final_bigquery_flow_parameters():
+    parameters = final_bigquery_flow.validate_parameters(
+        {
+            "keyword_extract_config": KeywordExtractionConfig(),
+            "regex_config": RegexConfig(),
+        }
+    )
+
+    assert (
+        parameters["keyword_extract_config"].keyword_groups()
+        == KeywordExtractionConfig.keyword_groups()
+    )
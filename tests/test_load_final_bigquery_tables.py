@@ -0,0 +1,94 @@
+"""Test the Tasks of the final Bigquery tables flow"""
+
+import logging
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+import load_final_bigquery_tables
+from load_final_bigquery_tables import (
+    extract_features_from_job_descriptions,
+    identify_extension_type_from_extensions,
+)
+from utils.config import KeywordExtractionConfig, RegexConfig
+
+
+def test_extract_features_from_job_descriptions_in_worker_processes(
+    monkeypatch,
+):
+    monkeypatch.setattr(
+        load_final_bigquery_tables,
+        "get_run_logger",
+        lambda: logging.getLogger(__name__),
+    )
+
+    df = pd.DataFrame(
+        {
+            "job_id": ["a", "b", "c", "d"],
+            "description": [
+                "Python und SQL auf AWS",
+                None,
+                "Python und SQL auf AWS",
+                "Docker, Bash und Go",
+            ],
+        }
+    )
+    config = KeywordExtractionConfig()
+
+    df_in_process = extract_features_from_job_descriptions.fn(df, config)
+
+    # Use the process pool for any number of descriptions
+    monkeypatch.setattr(
+        load_final_bigquery_tables, "PROCESS_POOL_MIN_DESCRIPTIONS", 1
+    )
+    monkeypatch.setattr(load_final_bigquery_tables.os, "cpu_count", lambda: 2)
+
+    # Prefect deployments load the flow module without keeping src on
+    # sys.path, so the spawned workers don't inherit it
+    src_dir = Path(load_final_bigquery_tables.__file__).resolve().parent
+    monkeypatch.setattr(
+        sys, "path", [p for p in sys.path if Path(p).resolve() != src_dir]
+    )
+
+    df_worker_processes = extract_features_from_job_descriptions.fn(
+        df, config
+    )
+
+    pd.testing.assert_frame_equal(df_worker_processes, df_in_process)
+
+
+def test_identify_extension_type_from_extensions(monkeypatch, recwarn):
+    monkeypatch.setattr(
+        load_final_bigquery_tables,
+        "get_run_logger",
+        lambda: logging.getLogger(__name__),
+    )
+
+    df = pd.DataFrame(
+        {
+            "job_id": ["a", "b", "c"],
+            "extensions": [
+                ["vor 3 Tagen", "Vollzeit", "Homeoffice"],
+                ["Teilzeit"],
+                None,
+            ],
+        }
+    )
+
+    df_extension_type = identify_extension_type_from_extensions.fn(
+        df, RegexConfig.day_hour_regex
+    )
+
+    pd.testing.assert_frame_equal(
+        df_extension_type,
+        pd.DataFrame(
+            {
+                "job_id": ["a", "b"],
+                "employment_type": ["Vollzeit", "Teilzeit"],
+                "posted_n_periods_ago": ["vor 3 Tagen", None],
+            }
+        ),
+        check_dtype=False,
+    )
+    assert not [w for w in recwarn if issubclass(w.category, UserWarning)]
@@ -0,0 +1,21 @@
+"""Test the processing functions"""
+
+import pytest
+from gensim.utils import tokenize
+
+from etl.process import tokenize_text
+
+TEXTS = [
+    "Wir suchen einen Data Engineer (m/w/d) für unser Team in Köln",
+    "Erfahrung mit Python 3.10, SQL & GCP; 5+ Jahre Berufserfahrung",
+    "Straße, Größe, Übermäßig, naïve café, Ärger über Öl",
+    "C++ / C# / R / Go: x a b 2nd 3D k8s",
+    "Datenverarbeitungsinfrastrukturentwicklung und Softwareentwicklungsmethoden",
+    "snake_case __dunder__ über_alles CamelCase",
+    "",
+]
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_tokenize_text_matches_gensim(text):
+    assert tokenize_text(text) == list(tokenize(text, deacc=True, lower=True))